@@ -44,12 +44,44 @@ import argparse
 import sys
 import os
 import re
-import pathlib
-from unittest import result
-from urllib.parse import urlparse, ParseResult, urlunparse, unquote as url_unquote
 import subprocess
-import tempfile
-import hashlib
+import functools
+import shutil
+import contextlib
+
+try:
+  from functools import cached_property
+except ImportError:
+  # python 3.7 fallback
+  class cached_property: # type: ignore[no-redef]
+    def __init__(self, func):
+      self.func = func
+      self.attrname: Optional[str] = None
+      self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+      self.attrname = name
+
+    def __get__(self, instance, owner=None):
+      if instance is None:
+        return self
+      value = self.func(instance)
+      instance.__dict__[self.attrname] = value
+      return value
+
+# Package specs without ':' that contain '/' or '#', or end in '.gz', are local paths
+_LOCAL_SPEC_RE = re.compile(r'[/#]|\.gz\Z')
+
+@functools.lru_cache(maxsize=256)
+def _norm_abs_dir(dirname: str) -> str:
+  return os.path.normpath(dirname)
+
+def _norm_dir(dirname: str) -> str:
+  # Only absolute paths are memoized; relative and '~' paths depend on the
+  # current directory and $HOME, so they are recomputed on every call.
+  if os.path.isabs(dirname):
+    return _norm_abs_dir(dirname)
+  return os.path.abspath(os.path.normpath(os.path.expanduser(dirname)))
 
 def searchpath_split(searchpath: Optional[str]=None) -> List[str]:
   if searchpath is None:
@@ -61,17 +93,21 @@ def searchpath_join(dirnames: List[str]) -> str:
   return os.pathsep.join(dirnames)
 
 def searchpath_normalize(searchpath: Optional[str]=None) -> str:
-  return searchpath_join(searchpath_split(searchpath))
+  if searchpath is None:
+    searchpath = os.environ['PATH']
+  return os.pathsep.join(x for x in searchpath.split(os.pathsep) if x != '')
 
 def searchpath_parts_contains_dir(parts: List[str], dirname: str) -> bool:
-  dirname = os.path.abspath(os.path.normpath(os.path.expanduser(dirname)))
+  dirname = _norm_dir(dirname)
   return dirname in parts
 
 def searchpath_contains_dir(searchpath: Optional[str], dirname: str) -> bool:
   return searchpath_parts_contains_dir(searchpath_split(searchpath), dirname)
 
 def searchpath_parts_remove_dir(parts: List[str], dirname: str) -> List[str]:
-  dirname = os.path.abspath(os.path.normpath(os.path.expanduser(dirname)))
+  dirname = _norm_dir(dirname)
+  if not dirname in parts:
+    return parts[:]
   result = [ x for x in parts if x != dirname ]
   return result
 
@@ -79,7 +115,7 @@ def searchpath_remove_dir(searchpath: Optional[str], dirname: str) -> str:
   return searchpath_join(searchpath_parts_remove_dir(searchpath_split(searchpath), dirname))
 
 def searchpath_parts_prepend(parts: List[str], dirname: str) -> List[str]:
-  dirname = os.path.abspath(os.path.normpath(os.path.expanduser(dirname)))
+  dirname = _norm_dir(dirname)
   result = [dirname] + searchpath_parts_remove_dir(parts, dirname)
   return result
 
@@ -87,7 +123,7 @@ def searchpath_prepend(searchpath: Optional[str], dirname: str) -> str:
   return searchpath_join(searchpath_parts_prepend(searchpath_split(searchpath), dirname))
 
 def searchpath_parts_prepend_if_missing(parts: List[str], dirname: str) -> List[str]:
-  dirname = os.path.abspath(os.path.normpath(os.path.expanduser(dirname)))
+  dirname = _norm_dir(dirname)
   if dirname in parts:
     result = parts[:]
   else:
@@ -98,7 +134,7 @@ def searchpath_prepend_if_missing(searchpath: Optional[str], dirname: str) -> st
   return searchpath_join(searchpath_parts_prepend_if_missing(searchpath_split(searchpath), dirname))
 
 def searchpath_parts_force_append(parts: List[str], dirname: str) -> List[str]:
-  dirname = os.path.abspath(os.path.normpath(os.path.expanduser(dirname)))
+  dirname = _norm_dir(dirname)
   result = searchpath_parts_remove_dir(parts, dirname) + [dirname]
   return result
 
@@ -106,7 +142,7 @@ def searchpath_force_append(searchpath: Optional[str], dirname: str) -> str:
   return searchpath_join(searchpath_parts_force_append(searchpath_split(searchpath), dirname))
 
 def searchpath_parts_append(parts: List[str], dirname: str) -> List[str]:
-  dirname = os.path.abspath(os.path.normpath(os.path.expanduser(dirname)))
+  dirname = _norm_dir(dirname)
   if dirname in parts:
     result = parts[:]
   else:
@@ -116,26 +152,65 @@ def searchpath_parts_append(parts: List[str], dirname: str) -> List[str]:
 def searchpath_append(searchpath: Optional[str], dirname: str) -> str:
   return searchpath_join(searchpath_parts_append(searchpath_split(searchpath), dirname))
 
-def deactivate_virtualenv(env: Optional[MutableMapping]=None):
-  if env is None:
-    env = os.environ
+def _deactivate_virtualenv_parts(env: MutableMapping, parts: List[str]) -> List[str]:
+  # Removes virtualenv variables from env and returns parts without the venv bin dir
   if 'VIRTUAL_ENV' in env:
     venv = env['VIRTUAL_ENV']
     del env['VIRTUAL_ENV']
     if 'POETRY_ACTIVE' in env:
       del env['POETRY_ACTIVE']
+    venv_bin = os.path.join(venv, 'bin')
+    parts = searchpath_parts_remove_dir(parts, venv_bin)
+  return parts
+
+def deactivate_virtualenv(env: Optional[MutableMapping]=None):
+  if env is None:
+    env = os.environ
+  if 'VIRTUAL_ENV' in env:
     if 'PATH' in env:
-      venv_bin = os.path.join(venv, 'bin')
-      env['PATH'] = searchpath_remove_dir(env['PATH'], venv_bin)
+      env['PATH'] = searchpath_join(_deactivate_virtualenv_parts(env, searchpath_split(env['PATH'])))
+    else:
+      _deactivate_virtualenv_parts(env, [])
 
 def activate_virtualenv(venv_dir: str, env: Optional[MutableMapping]=None):
   venv_dir = os.path.abspath(os.path.normpath(os.path.expanduser(venv_dir)))
   venv_bin_dir = os.path.join(venv_dir, 'bin')
   if env is None:
     env = os.environ
-  deactivate_virtualenv(env)
+  parts = _deactivate_virtualenv_parts(env, searchpath_split(env.get('PATH', '')))
   env['VIRTUAL_ENV'] = venv_dir
-  env['PATH'] = searchpath_prepend_if_missing(env['PATH'], venv_bin_dir)
+  env['PATH'] = searchpath_join(searchpath_parts_prepend_if_missing(parts, venv_bin_dir))
+
+@functools.lru_cache(maxsize=1024)
+def _spec_hash(package_spec: str) -> str:
+  # The digest names the app directory under apps_dir, so it is part of the on-disk
+  # format shared by all vpyapp versions; changing the algorithm would orphan
+  # existing installations.
+  import hashlib
+  h = hashlib.sha1(package_spec.encode('utf-8'))
+  return h.hexdigest()
+
+def _read_package_spec_file(package_spec_filename: str) -> Optional[str]:
+  try:
+    with open(package_spec_filename, encoding='utf-8') as f:
+      return f.read().rstrip()
+  except FileNotFoundError:
+    return None
+
+def _check_call_with_log(
+    cmd: List[str],
+    env: Optional[Dict[str, str]] = None,
+    stdout: Any = None,
+    stderr: Any = None,
+    install_log: Optional[bytearray] = None,
+    ) -> None:
+  if install_log is None:
+    subprocess.check_call(cmd, env=env, stdout=stdout, stderr=stderr)
+  else:
+    # Capture combined stdout/stderr in memory and append it to install_log
+    proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    install_log.extend(proc.stdout)
+    proc.check_returncode()
 
 class CmdExitError(RuntimeError):
   exit_code: int
@@ -164,9 +239,6 @@ class Cli:
   verbose: bool = False
   args: argparse.Namespace
   _package_spec: Optional[str] = None
-  _package_spec_hash: Optional[str] = None
-  _no_venv_env: Optional[Dict[str, str]] = None
-  _venv_env: Optional[Dict[str, str]] = None
 
   def __init__(self, argv: Optional[Sequence[str]]=None):
     self.argv = argv
@@ -175,9 +247,8 @@ class Cli:
     raise CmdExitError(msg="A subcommand is required")
 
   def normalize_package_spec(self, package_spec: str) -> str:
-    if not ':' in package_spec and (
-          '/' in package_spec or '#' in package_spec or package_spec.endswith('.gz')
-        ):
+    if not ':' in package_spec and _LOCAL_SPEC_RE.search(package_spec):
+      import pathlib
       pathname = os.path.abspath(os.path.normpath(os.path.expanduser(package_spec)))
       package_spec = pathlib.Path(pathname).as_uri()
 
@@ -195,73 +266,57 @@ class Cli:
     self._package_spec = spec
     return self._package_spec
 
-  @property
+  @cached_property
   def package_spec_hash(self) -> str:
-    if self._package_spec_hash is None:
-      package_spec = self.package_spec
-      h = hashlib.sha1(package_spec.encode('utf-8'))
-      self._package_spec_hash = h.hexdigest()
-    return self._package_spec_hash
+    return _spec_hash(self.package_spec)
 
-  @property
+  @cached_property
   def app_dir(self) -> str:
     return os.path.join(self.apps_dir, self.package_spec_hash)
 
-  @property
+  @cached_property
   def package_spec_filename(self) -> str:
     return os.path.join(self.app_dir, "package-spec.txt")
 
-  @property
+  @cached_property
   def app_venv_dir(self) -> str:
     return os.path.join(self.app_dir, '.venv')
 
-  @property
+  @cached_property
   def app_bin_dir(self) -> str:
     return os.path.join(self.app_venv_dir, 'bin')
 
-  @property
+  @cached_property
   def no_venv_env(self) -> Dict[str, str]:
-    if self._no_venv_env is None:
-      no_venv_env = dict(os.environ)
-      deactivate_virtualenv(no_venv_env)
-      self._no_venv_env = no_venv_env
-    return self._no_venv_env
+    no_venv_env = os.environ.copy()
+    deactivate_virtualenv(no_venv_env)
+    return no_venv_env
 
-  @property
+  @cached_property
   def venv_env(self) -> Dict[str, str]:
-    if self._venv_env is None:
-      app_venv_dir = self.app_venv_dir
-      venv_env = dict(self.no_venv_env)
-      activate_virtualenv(app_venv_dir, venv_env)
-      self._venv_env = venv_env
-    return self._venv_env
+    venv_env = dict(self.no_venv_env)
+    activate_virtualenv(self.app_venv_dir, venv_env)
+    return venv_env
 
-  @property
+  @cached_property
   def python_prog(self) -> str:
     return os.path.join(self.app_bin_dir, 'python3')
 
-  @property
+  @cached_property
   def pip_prog(self) -> str:
     return os.path.join(self.app_bin_dir, 'pip3')
 
-  @property
+  @cached_property
   def project_init_helper_prog(self) -> str:
     return os.path.join(self.app_bin_dir, 'project-init-helper')
 
   def remove_appdir(self) -> None:
-    if os.path.exists(self.package_spec_filename):
+    with contextlib.suppress(FileNotFoundError):
       os.remove(self.package_spec_filename)
-    if os.path.exists(self.app_dir):
-      subprocess.call(['rm', '-fr', self.app_dir])
+    shutil.rmtree(self.app_dir, ignore_errors=True)
 
   def find_command_in_path(self, cmd: str) -> Optional[str]:
-    try:
-      result: Optional[str] = subprocess.check_output(['which', cmd]).decode('utf-8').rstrip()
-      if result == '':
-        result = None
-    except subprocess.CalledProcessError:
-      result = None
-    return result
+    return shutil.which(cmd)
   
   def module_exists(self, modname: str) -> bool:
     import importlib.util
@@ -283,7 +338,7 @@ class Cli:
       pass
     return result
 
-  @property
+  @cached_property
   def local_bin_dir(self) -> str:
     return os.path.join(self.home_dir, '.local', 'bin')
 
@@ -297,7 +352,7 @@ class Cli:
         if not os.path.isdir(cache_dir):
           os.makedirs(cache_dir)
         get_pip_script = os.path.join(cache_dir, 'get-pip.py')
-        if os.path.exists(get_pip_script):
+        with contextlib.suppress(FileNotFoundError):
           os.remove(get_pip_script)
         import urllib.request
         urllib.request.urlretrieve("https://bootstrap.pypa.io/get-pip.py", get_pip_script)
@@ -332,12 +387,24 @@ class Cli:
       clean: bool,
       stdout: Any = sys.stdout,
       stderr: Any = sys.stderr,
+      install_log: Optional[bytearray] = None,
       ) -> str:
     self.package_spec = package_spec
     package_spec = self.package_spec
     app_dir = self.app_dir
     app_venv_dir = self.app_venv_dir
-
+    python = self.python_prog
+    pip = self.pip_prog
+
+    if (
+          not clean and
+          not update and
+          os.path.exists(self.package_spec_filename) and
+          os.path.exists(python) and
+          os.path.exists(pip)
+        ):
+      # Already fully installed; skip OS package checks and environment setup
+      return app_dir
 
     try:
       os_packages: List[str] = []
@@ -359,8 +426,6 @@ class Cli:
         print(f"NOTE: sudo is required to install {os_packages}. Enter sudo password, or CTRL-C and manually install", file=sys.stderr)
         subprocess.check_call(['sudo', 'apt-get', 'install', '-y'] + os_packages)
 
-      python = self.python_prog
-      pip = self.pip_prog
       if (
             clean or
             not os.path.exists(self.package_spec_filename) or 
@@ -376,29 +441,23 @@ class Cli:
         virtualenv_prog = self.install_local_virtualenv()
         subprocess.check_call([virtualenv_prog, '-q', app_venv_dir])
         is_updated_venv = True
-        
-      no_venv_env = self.no_venv_env
-      venv_env = self.venv_env
+
 
       if not os.path.exists(pip):
         raise RuntimeError("pip not in venv virtualenv create")
 
-      if update:
-        cmd = [pip, 'install', '--upgrade', 'pip']
-        subprocess.check_call(cmd, env=venv_env, stdout=stdout, stderr=stderr)
-
       if update or is_updated_venv:
-        cmd = [pip, 'install']
+        venv_env = self.venv_env
+
         if update:
-          cmd.append('--upgrade')
-        cmd.append('wheel')
-        subprocess.check_call(cmd, env=venv_env, stdout=stdout, stderr=stderr)
+          cmd = [pip, 'install', '--upgrade', 'pip']
+          _check_call_with_log(cmd, env=venv_env, stdout=stdout, stderr=stderr, install_log=install_log)
 
         cmd = [pip, 'install']
         if update:
           cmd.extend(['--upgrade', '--upgrade-strategy', 'eager'])
-        cmd.append(self.package_spec)
-        subprocess.check_call(cmd, env=venv_env, stdout=stdout, stderr=stderr)
+        cmd.extend(['wheel', self.package_spec])
+        _check_call_with_log(cmd, env=venv_env, stdout=stdout, stderr=stderr, install_log=install_log)
       if not os.path.exists(self.package_spec_filename):
         with open(self.package_spec_filename, 'w', encoding='utf-8') as f:
           f.write(self.package_spec)
@@ -443,20 +502,17 @@ class Cli:
           clean=clean,
         )
     else:
-      with tempfile.NamedTemporaryFile() as f_install_log:
-        try:
-          self.do_install(
-              package_spec,
-              update=update,
-              clean=clean,
-              stdout=f_install_log,
-              stderr=subprocess.STDOUT
-            )
-        except Exception as e:
-          f_install_log.flush()
-          f_install_log.seek(0)
-          sys.stderr.write(f_install_log.read().decode('utf-8'))
-          raise
+      install_log = bytearray()
+      try:
+        self.do_install(
+            package_spec,
+            update=update,
+            clean=clean,
+            install_log=install_log,
+          )
+      except Exception as e:
+        sys.stderr.write(install_log.decode('utf-8', errors='replace'))
+        raise
 
     if len(app_cmd) > 0:
       cmd = app_cmd[:]
@@ -479,14 +535,14 @@ class Cli:
   def cmd_ls(self) -> int:
     apps_dir = self.apps_dir
     if os.path.exists(apps_dir):
-      results: List[str] = []
-      for entry in os.listdir(apps_dir):
-        package_spec_filename = os.path.join(apps_dir, entry, "package-spec.txt")
-        if os.path.exists(package_spec_filename):
-          with open(package_spec_filename, encoding='utf-8') as f:
-            package_spec = f.read().rstrip()
-            results.append(package_spec)
-      results.sort()
+      from concurrent.futures import ThreadPoolExecutor
+      with os.scandir(apps_dir) as it:
+        package_spec_filenames = [
+            os.path.join(entry.path, "package-spec.txt") for entry in it if entry.is_dir(follow_symlinks=False)
+          ]
+      with ThreadPoolExecutor(max_workers=8) as executor:
+        package_specs = list(executor.map(_read_package_spec_file, package_spec_filenames))
+      results: List[str] = sorted(x for x in package_specs if not x is None)
       if len(results) > 0:
         print('\n'.join(results))
     return 0
@@ -501,10 +557,10 @@ class Cli:
 
   def cmd_uninstall(self) -> int:
     self.package_spec = self.args.package_name
-    app_dir = self.app_dir
-    if not os.path.exists(app_dir):
+    try:
+      shutil.rmtree(self.app_dir)
+    except FileNotFoundError:
       raise CmdExitError(msg=f"Package is not installed (must match exactly): {self.package_spec}")
-    subprocess.call(['rm', '-fr', app_dir])
     return 0
 
   def get_parser(self) -> argparse.ArgumentParser: